@@ -1,13 +1,16 @@
 import aiohttp
-import aiofiles
 import asyncio
+import threading
 from typing import Callable, Optional, Dict, List, Tuple
+from urllib.parse import urlsplit, parse_qsl, urlencode
+from functools import lru_cache
+from multidict import CIMultiDict
 import os
-from concurrent.futures import ThreadPoolExecutor
-from download_optimizer import DownloadOptimizer, ConnectionPool
+import random
+import shutil
+from download_optimizer import DownloadOptimizer
 import time
 from iptv_auth import IPTVAuthenticator
-from utils import format_speed
 import logging
 from download_state import DownloadState
 
@@ -16,7 +19,72 @@ logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger('async_downloader')
 
+# orjson parses JSON payloads several times faster than the stdlib when
+# it's installed; fall back silently otherwise
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    import json as _stdlib_json
+    _json_loads = _stdlib_json.loads
+
+# Unit thresholds for the inlined speed formatting in the download loop
+_KB = 1024.0
+_MB = 1048576.0
+
+@lru_cache(maxsize=256)
+def _split_url(url: str):
+    """Memoized urlsplit - repeat parses of the same URL become dict hits."""
+    return urlsplit(url)
+
+@lru_cache(maxsize=256)
+def _query_pairs(query: str) -> Tuple[Tuple[str, str], ...]:
+    """Memoized parse_qsl, returned as a tuple so the cache entry is immutable."""
+    return tuple(parse_qsl(query, keep_blank_values=True))
+
+def _write_all(fd: int, data) -> None:
+    """Write the whole buffer to a raw fd, handling short writes."""
+    view = memoryview(data)
+    while view:
+        written = os.write(fd, view)
+        view = view[written:]
+
+def _pwrite_all(fd: int, data, offset: int) -> None:
+    """Write the whole buffer at an absolute offset, handling short writes."""
+    view = memoryview(data)
+    while view:
+        written = os.pwrite(fd, view, offset)
+        offset += written
+        view = view[written:]
+
+# os.pwrite is Unix-only; without it chunks write their own part files
+# and a merge pass assembles them (the pre-shared-fd behaviour)
+_HAS_PWRITE = hasattr(os, 'pwrite')
+
+def _merge_parts(filepath: str, num_chunks: int) -> None:
+    """Concatenate .partN files into place for the no-pwrite fallback."""
+    part_path = f"{filepath}.part"
+    with open(part_path, 'wb') as out:
+        for i in range(num_chunks):
+            with open(f"{filepath}.part{i}", 'rb') as src:
+                shutil.copyfileobj(src, out, 1 << 20)
+    for i in range(num_chunks):
+        os.remove(f"{filepath}.part{i}")
+    os.rename(part_path, filepath)
+
 class AsyncDownloader:
+    # Static headers shared by every request, already in aiohttp's native
+    # case-insensitive form so request setup skips the per-call dict
+    # conversion; only copied when a Range header has to be attached
+    # Accept-Encoding: identity stops servers from gzipping media that is
+    # already compressed, which would waste their CPU and break the
+    # Content-Length/Range math progress and resume rely on
+    _DEFAULT_HEADERS = CIMultiDict({
+        'User-Agent': 'VLC/3.0.16 LibVLC/3.0.16',
+        'Accept': '*/*',
+        'Accept-Encoding': 'identity',
+    })
+
     def __init__(self,
                  max_concurrent: int = 3,
                  max_chunks: int = 4,
@@ -26,10 +94,6 @@ class AsyncDownloader:
         self.max_concurrent = max_concurrent
         self.max_chunks = max_chunks
         self.optimizer = DownloadOptimizer(max_speed_limit=max_speed_limit)
-        self.connection_pool = ConnectionPool(
-            max_connections=max_concurrent * 2,
-            max_per_host=max_concurrent
-        )
         self.session = None
         self.retry_count = 3  # Add retry count for failed requests
         self.authenticator = IPTVAuthenticator()
@@ -38,43 +102,85 @@ class AsyncDownloader:
         self.enable_chunked = enable_chunked
         self.download_state = DownloadState() if enable_resume else None
         self.active_downloads = {}
+        # Per-host gate so one origin never sees more than max_concurrent
+        # files in flight, regardless of the connector's global limit
+        self._host_sems: Dict[str, asyncio.Semaphore] = {}
+        # Directories we've already created, to skip repeat makedirs syscalls
+        self._dirs_created = set()
+        # Token-refresh endpoint per (scheme, netloc), built once per host
+        self._refresh_base_cache: Dict[Tuple[str, str], str] = {}
+        # Short-lived cache of authenticated URLs so a burst of files on
+        # the same stream shares one auth round-trip; the lock coalesces
+        # concurrent refreshes into a single player_api.php call
+        self._auth_cache: Dict[Tuple[str, str], Tuple[float, str]] = {}
+        self._auth_lock = asyncio.Lock()
+        self._state_saver_task = None
 
     async def __aenter__(self):
         timeout = aiohttp.ClientTimeout(total=None, connect=60, sock_read=60)
-        conn = aiohttp.TCPConnector(limit=self.max_concurrent * 2, force_close=True)
-        self.session = aiohttp.ClientSession(timeout=timeout, connector=conn)
+        # Keep-alive connections are reused across files, avoiding a full
+        # TCP+TLS handshake per request (the playlist usually lives on one host)
+        conn = aiohttp.TCPConnector(
+            limit=self.max_concurrent * 4,
+            limit_per_host=self.max_concurrent * 2,
+            keepalive_timeout=75,
+            enable_cleanup_closed=True,
+            ttl_dns_cache=300
+        )
+        self.session = aiohttp.ClientSession(timeout=timeout, connector=conn,
+                                             read_bufsize=2 ** 20)
+        # One background task persists resume state for all downloads, so
+        # the byte-streaming loops never touch the state file themselves
+        self._sync_state_saver()
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if self._state_saver_task:
+            self._state_saver_task.cancel()
+            try:
+                await self._state_saver_task
+            except asyncio.CancelledError:
+                pass
+            self._state_saver_task = None
         if self.authenticator:
             await self.authenticator.close()
         if self.session:
             await self.session.close()
 
     async def _refresh_token(self, url: str) -> str:
-        # Extract base URL and parameters
-        from urllib.parse import urlparse, parse_qs, urlencode
-        parsed = urlparse(url)
-        params = parse_qs(parsed.query)
+        # Clean CDN URLs carry no token - skip the parse entirely
+        if 'play_token=' not in url:
+            return url
+
+        # urlsplit is cheaper than urlparse (no params field) and both the
+        # split and the query decode are memoized for repeat URLs
+        parsed = _split_url(url)
+        params = dict(_query_pairs(parsed.query))
 
         # If there's a play_token, try to refresh it
         if 'play_token' in params:
-            # Construct token refresh URL - adjust this according to your server's API
-            base_url = f"{parsed.scheme}://{parsed.netloc}/player_api.php"
+            # Construct token refresh URL once per host - adjust this
+            # according to your server's API
+            cache_key = (parsed.scheme, parsed.netloc)
+            base_url = self._refresh_base_cache.get(cache_key)
+            if base_url is None:
+                base_url = f"{parsed.scheme}://{parsed.netloc}/player_api.php"
+                self._refresh_base_cache[cache_key] = base_url
+
             refresh_params = {
-                'mac': params.get('mac', [''])[0],
-                'type': params.get('type', [''])[0],
-                'stream': params.get('stream', [''])[0],
+                'mac': params.get('mac', ''),
+                'type': params.get('type', ''),
+                'stream': params.get('stream', ''),
                 'refresh': '1'
             }
 
             async with self.session.get(f"{base_url}?{urlencode(refresh_params)}") as response:
                 if response.status == 200:
-                    data = await response.json()
+                    data = _json_loads(await response.read())
                     if 'play_token' in data:
-                        params['play_token'] = [data['play_token']]
+                        params['play_token'] = data['play_token']
                         # Reconstruct URL with new token
-                        return parsed._replace(query=urlencode(params, doseq=True)).geturl()
+                        return parsed._replace(query=urlencode(params)).geturl()
 
         return url
 
@@ -82,6 +188,98 @@ class AsyncDownloader:
         """Set a global speed limit for all downloads in bytes per second."""
         self.optimizer.set_speed_limit(limit_bytes_per_sec)
 
+    def _sync_state_saver(self) -> None:
+        """Start or stop the background saver to match enable_resume.
+
+        Must run on the session's event loop; reconfigure() schedules it
+        there so toggling resume mid-session takes effect.
+        """
+        if self.enable_resume and self.download_state:
+            if self._state_saver_task is None:
+                self._state_saver_task = asyncio.create_task(self._state_saver())
+        elif self._state_saver_task is not None:
+            self._state_saver_task.cancel()
+            self._state_saver_task = None
+
+    async def _state_saver(self) -> None:
+        """
+        Persist resume state for every active download every 5 seconds.
+
+        One background task snapshots active_downloads per tick and writes
+        each file's state off-loop, replacing the per-chunk saves that used
+        to run max_chunks times per interval from inside the write loops.
+        """
+        while True:
+            await asyncio.sleep(5)
+            # Re-check each tick: reconfigure() may toggle resume off (and
+            # drop download_state) while we're between sleeps
+            if not (self.enable_resume and self.download_state):
+                continue
+            try:
+                # Snapshot so chunks can come and go while we write
+                for filepath, file_chunks in list(self.active_downloads.items()):
+                    chunks = list(file_chunks.values())
+                    if not chunks:
+                        continue
+                    any_chunk = chunks[0]
+                    await self.download_state.asave_state(
+                        filepath=filepath,
+                        url=any_chunk['url'],
+                        downloaded_chunks={c['chunk_id']: c['bytes_downloaded']
+                                           for c in chunks},
+                        total_size=any_chunk.get('file_size', 0),
+                        chunk_ranges=[(c['start'], c['end']) for c in chunks]
+                    )
+            except Exception as e:
+                # A failed checkpoint must not kill the saver for the rest
+                # of the session; the next tick retries
+                logger.error(f"Error saving resume state: {str(e)}")
+
+    _AUTH_CACHE_TTL = 30.0  # seconds
+
+    async def _authenticate(self, url: str, invalidate: bool = False) -> str:
+        """
+        Authenticate through a short-TTL cache keyed by (host, stream).
+
+        Collapses the N auth round-trips a playlist burst would otherwise
+        issue into one per stream; pass invalidate=True after a 458 so the
+        stale token isn't reused.
+        """
+        parsed = _split_url(url)
+        params = dict(_query_pairs(parsed.query))
+        # The cached value is the full authenticated URL, so the key must
+        # never alias two different files: without a stream id, fall back
+        # to the URL itself rather than sharing (host, '')
+        stream = params.get('stream', '')
+        key = (parsed.netloc, stream) if stream else (parsed.netloc, url)
+
+        # Lock-free fast path for the common cache hit
+        if not invalidate:
+            cached = self._auth_cache.get(key)
+            if cached and time.monotonic() - cached[0] < self._AUTH_CACHE_TTL:
+                return cached[1]
+
+        async with self._auth_lock:
+            # Re-check under the lock: when a token rotates, every in-flight
+            # chunk hits 458 at once, and whichever task got here first has
+            # already refreshed - a very recent entry is that refresh
+            cached = self._auth_cache.get(key)
+            if cached:
+                age = time.monotonic() - cached[0]
+                if invalidate:
+                    if age < 2.0:
+                        return cached[1]
+                    self._auth_cache.pop(key, None)
+                elif age < self._AUTH_CACHE_TTL:
+                    return cached[1]
+
+            # Propagate the invalidation so the authenticator drops its
+            # own cached play_token rather than serving it straight back
+            fresh_url = await self.authenticator.authenticate(
+                url, force_refresh=invalidate)
+            self._auth_cache[key] = (time.monotonic(), fresh_url)
+            return fresh_url
+
     async def _download_chunk(self,
                              url: str,
                              filepath: str,
@@ -91,7 +289,8 @@ class AsyncDownloader:
                              total_chunks: int = 1,
                              total_size: int = 0,
                              progress_callback: Optional[Callable] = None,
-                             resume_from: int = 0) -> int:
+                             resume_from: int = 0,
+                             out_fd: Optional[int] = None) -> int:
         """
         Download a specific chunk of a file with resume support.
 
@@ -105,59 +304,78 @@ class AsyncDownloader:
             total_size: Total file size
             progress_callback: Callback for progress updates
             resume_from: Byte position to resume from (for partial downloads)
+            out_fd: Shared output fd to pwrite into at this chunk's offset;
+                when None the chunk streams to its own .part file
 
         Returns:
             Number of bytes downloaded
         """
         temp_filepath = f"{filepath}.part{chunk_id}"
+        basename = os.path.basename(filepath)
         bytes_downloaded = resume_from
         retries = 0
 
-        # Track this download in active_downloads
-        download_key = f"{filepath}_{chunk_id}"
-        self.active_downloads[download_key] = {
+        # Track this download in active_downloads, keyed filepath -> chunk
+        # so "all chunks of a file" is a single dict lookup
+        chunk_info = {
             'url': url,
             'filepath': filepath,
             'chunk_id': chunk_id,
+            'start': start,
+            'end': end,
             'bytes_downloaded': bytes_downloaded,
-            'total_size': (end - start + 1) if end is not None and start is not None else total_size
+            'total_size': (end - start + 1) if end is not None and start is not None else total_size,
+            'file_size': total_size
         }
-
-        # Check if we need to resume and if the temp file exists
-        file_mode = 'ab' if resume_from > 0 and os.path.exists(temp_filepath) else 'wb'
+        self.active_downloads.setdefault(filepath, {})[chunk_id] = chunk_info
+
+        # Per-chunk progress constants, hoisted out of the byte loop: this
+        # chunk's byte span and where it sits in the overall percentage
+        chunk_span = chunk_info['total_size']
+        chunk_base_pct = chunk_id * 100.0 / total_chunks
+        chunk_scale_pct = 100.0 / total_chunks
+
+        # Part files are only used without a shared output fd. A non-zero
+        # resume_from came from the caller statting the part file, so no
+        # second exists() probe is needed here.
+        if out_fd is None:
+            file_mode = 'ab' if resume_from > 0 else 'wb'
+        else:
+            file_mode = 'wb'
+
+        # Static headers unless a Range has to be attached (aiohttp sends
+        # Connection: keep-alive on its own). Built once so the 458 re-auth
+        # path re-issues the request with no per-attempt setup.
+        headers = self._DEFAULT_HEADERS
+
+        # Adjust range for resume
+        if start is not None:
+            adjusted_start = start + resume_from
+            range_header = f"bytes={adjusted_start}-"
+            if end is not None:
+                range_header = f"bytes={adjusted_start}-{end}"
+            headers = CIMultiDict(self._DEFAULT_HEADERS)
+            headers['Range'] = range_header
+        elif resume_from > 0:
+            # If no start was specified but we're resuming
+            headers = CIMultiDict(self._DEFAULT_HEADERS)
+            headers['Range'] = f"bytes={resume_from}-"
 
         while retries < self.retry_count:
             try:
-                await self.connection_pool.acquire(url)
-
-                # Prepare headers with range if specified
-                headers = {
-                    'User-Agent': 'VLC/3.0.16 LibVLC/3.0.16',
-                    'Accept': '*/*',
-                    'Connection': 'keep-alive'
-                }
-
-                # Adjust range for resume
-                if start is not None:
-                    adjusted_start = start + resume_from
-                    range_header = f"bytes={adjusted_start}-"
-                    if end is not None:
-                        range_header = f"bytes={adjusted_start}-{end}"
-                    headers['Range'] = range_header
-                elif resume_from > 0:
-                    # If no start was specified but we're resuming
-                    headers['Range'] = f"bytes={resume_from}-"
-
-                # Apply rate limiting before making request
-                chunk_size = 65536  # Default chunk size for reading from response
-                await self.optimizer.apply_rate_limit(url, chunk_size)
-
                 async with self.session.get(url, headers=headers, allow_redirects=True) as response:
                     if response.status == 458:  # Token expired
                         if retries < self.retry_count - 1:
-                            url = await self.authenticator.authenticate(url)
+                            url = await self._authenticate(url, invalidate=True)
                             retries += 1
-                            await asyncio.sleep(2)
+                            # Re-auth is enough; only wait if the server
+                            # explicitly asked us to
+                            retry_after = response.headers.get('Retry-After')
+                            if retry_after:
+                                try:
+                                    await asyncio.sleep(float(retry_after))
+                                except ValueError:
+                                    pass
                             continue
 
                     # Check if range request was accepted
@@ -174,178 +392,226 @@ class AsyncDownloader:
                         if resume_from > 0:
                             logger.warning(f"Server doesn't support resume, starting from beginning")
                             bytes_downloaded = 0
+                            resume_from = 0
                             file_mode = 'wb'  # Start from scratch
 
                     if response.status not in (200, 206):
-                        self.optimizer.handle_server_error(url)
+                        # Pass any server-sent Retry-After to the backoff
+                        retry_after = response.headers.get('Retry-After')
+                        try:
+                            retry_after = float(retry_after) if retry_after else None
+                        except ValueError:
+                            retry_after = None
+                        self.optimizer.handle_server_error(url, retry_after)
                         raise Exception(f"HTTP {response.status}: {response.reason}")
 
-                    # Create directory if it doesn't exist
-                    os.makedirs(os.path.dirname(filepath), exist_ok=True)
-
-                    # Download the chunk
-                    start_time = time.time()
-                    last_update = start_time
-                    speed_samples = []  # For calculating average speed
-                    last_save_state = start_time
-
-                    async with aiofiles.open(temp_filepath, file_mode) as f:
-                        async for chunk in response.content.iter_chunked(chunk_size):
-                            await f.write(chunk)
+                    # Download the chunk.  Speed is tracked with two running
+                    # counters over a sliding window instead of a per-chunk
+                    # sample list, and the monotonic clock is only read every
+                    # 256 KiB to keep the byte loop O(1).
+                    now = time.monotonic()
+                    last_update = now
+                    window_start_time = now
+                    window_start_bytes = bytes_downloaded
+                    next_check_bytes = bytes_downloaded + 262144
+                    next_report_bytes = 0
+
+                    # Write through a raw fd with a ~2 MiB coalescing buffer:
+                    # one executor hop per flush instead of one thread
+                    # hand-off per received chunk. With a shared output fd
+                    # the bytes land straight at this chunk's absolute
+                    # offset - no part file and no merge pass afterwards.
+                    if out_fd is None:
+                        flags = os.O_WRONLY | os.O_CREAT
+                        flags |= os.O_APPEND if file_mode == 'ab' else os.O_TRUNC
+                        fd = os.open(temp_filepath, flags, 0o644)
+                    else:
+                        fd = out_fd
+                    write_buf = bytearray()
+                    flush_offset = (start or 0) + resume_from
+                    loop = asyncio.get_running_loop()
+                    try:
+                        if out_fd is None:
+                            if hasattr(os, 'posix_fadvise'):
+                                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+
+                            # Reserve the full extent up-front when the size
+                            # is known - fewer metadata updates and less
+                            # fragmentation while the chunks stream in
+                            expected_size = (end - start + 1) if end is not None and start is not None else total_size
+                            if expected_size > 0 and file_mode != 'ab':
+                                try:
+                                    os.posix_fallocate(fd, 0, expected_size)
+                                except (AttributeError, OSError):
+                                    pass
+
+                        # iter_any() hands over each transport read as-is -
+                        # no repacking into fixed-size bytes objects, so no
+                        # extra allocation or memcpy per received buffer
+                        async for chunk in response.content.iter_any():
+                            write_buf += chunk
+                            if len(write_buf) >= 1 << 21:
+                                # The executor hop is awaited before the
+                                # buffer is touched again, so the bytearray
+                                # can be written and reused in place - no
+                                # snapshot copy, no allocation per flush
+                                if out_fd is None:
+                                    await loop.run_in_executor(None, _write_all, fd, write_buf)
+                                else:
+                                    await loop.run_in_executor(None, _pwrite_all, fd, write_buf, flush_offset)
+                                flush_offset += len(write_buf)
+                                write_buf.clear()
                             bytes_downloaded += len(chunk)
-                            speed_samples.append((time.time(), len(chunk)))
 
                             # Update active download tracking
-                            self.active_downloads[download_key]['bytes_downloaded'] = bytes_downloaded
-
-                            # Save download state periodically (every 5 seconds)
-                            current_time = time.time()
-                            if self.enable_resume and current_time - last_save_state >= 5:
-                                if self.download_state and filepath in self.active_downloads:
-                                    # Collect all chunk progress
-                                    downloaded_chunks = {}
-                                    chunk_ranges = []
-
-                                    for key, data in self.active_downloads.items():
-                                        if key.startswith(f"{filepath}_"):
-                                            chunk_id = data['chunk_id']
-                                            downloaded_chunks[chunk_id] = data['bytes_downloaded']
-
-                                    # Save state for resuming later if needed
-                                    self.download_state.save_state(
-                                        filepath=filepath,
-                                        url=url,
-                                        downloaded_chunks=downloaded_chunks,
-                                        total_size=total_size,
-                                        chunk_ranges=[(start, end) for _, (start, end) in enumerate(self.active_downloads)]
-                                    )
-                                    last_save_state = current_time
-
-                            # Apply rate limiting for next chunk
-                            await self.optimizer.apply_rate_limit(url, chunk_size)
-
-                            # Calculate speed and update progress
-                            if current_time - last_update >= 0.5 and progress_callback:
-                                # Remove old samples from calculation
-                                speed_samples = [(t, s) for t, s in speed_samples
-                                               if current_time - t <= 2]
-
-                                if speed_samples:
-                                    duration = current_time - speed_samples[0][0]
-                                    if duration > 0:
-                                        speed = sum(s for _, s in speed_samples) / duration
-                                        speed_str = format_speed(speed)
-
-                                        # Update optimizer with speed information
-                                        self.optimizer.update_speed(url,
-                                                                   sum(s for _, s in speed_samples),
-                                                                   duration)
-
-                                        if total_size > 0:
-                                            # Calculate overall progress considering all chunks
-                                            chunk_size_bytes = (end - start + 1) if end is not None and start is not None else total_size
-                                            chunk_progress = bytes_downloaded / chunk_size_bytes
-                                            overall_progress = (chunk_id / total_chunks) + (chunk_progress / total_chunks)
-                                            progress = overall_progress * 100
-
-                                            progress_callback(
-                                                os.path.basename(filepath),
-                                                progress,
-                                                speed_str
-                                            )
-
-                                last_update = current_time
+                            chunk_info['bytes_downloaded'] = bytes_downloaded
+
+                            # Account the bytes actually received this pass;
+                            # the sync guard keeps the unlimited case free
+                            # of a coroutine round-trip per buffer
+                            if self.optimizer.needs_throttle(url):
+                                await self.optimizer.apply_rate_limit(url, len(chunk))
+
+                            if bytes_downloaded < next_check_bytes:
+                                continue
+                            next_check_bytes = bytes_downloaded + 262144
+                            now = time.monotonic()
+
+                            # Calculate speed and update progress; throttled
+                            # by bytes delivered as well as wallclock so fast
+                            # LAN downloads don't spam the GUI thread
+                            if (progress_callback and bytes_downloaded >= next_report_bytes
+                                    and now - last_update >= 0.25):
+                                next_report_bytes = bytes_downloaded + max(total_size // 200, 1 << 20)
+                                duration = now - window_start_time
+                                if duration > 0:
+                                    speed = (bytes_downloaded - window_start_bytes) / duration
+                                    # Inlined format_speed: saves a function
+                                    # call per progress tick
+                                    if speed >= _MB:
+                                        speed_str = f"{speed / _MB:.1f} MB/s"
+                                    elif speed >= _KB:
+                                        speed_str = f"{speed / _KB:.1f} KB/s"
+                                    else:
+                                        speed_str = f"{speed:.1f} B/s"
+
+                                    # Update optimizer with speed information
+                                    self.optimizer.update_speed(url,
+                                                               bytes_downloaded - window_start_bytes,
+                                                               duration)
+
+                                    if chunk_span > 0:
+                                        # Overall progress across all chunks,
+                                        # from the precomputed constants
+                                        progress = chunk_base_pct + (bytes_downloaded / chunk_span) * chunk_scale_pct
+
+                                        progress_callback(
+                                            basename,
+                                            progress,
+                                            speed_str
+                                        )
+
+                                last_update = now
+
+                                # Slide the window forward so speed reflects
+                                # recent throughput, not the whole transfer
+                                if now - window_start_time > 2.0:
+                                    window_start_time = now
+                                    window_start_bytes = bytes_downloaded
+                    finally:
+                        # Flush the remainder so partial bytes survive for resume
+                        if write_buf:
+                            if out_fd is None:
+                                _write_all(fd, write_buf)
+                            else:
+                                _pwrite_all(fd, write_buf, flush_offset)
+                        if out_fd is None:
+                            os.close(fd)
 
                     # Chunk download successful
                     # Remove from active downloads
-                    if download_key in self.active_downloads:
-                        del self.active_downloads[download_key]
+                    file_chunks = self.active_downloads.get(filepath)
+                    if file_chunks is not None:
+                        file_chunks.pop(chunk_id, None)
+                        if not file_chunks:
+                            del self.active_downloads[filepath]
 
                     return bytes_downloaded
 
             except Exception as e:
                 logger.error(f"Chunk {chunk_id} download error for {url}: {str(e)}")
 
-                # Don't delete the temp file if we're going to resume
-                if not self.enable_resume and os.path.exists(temp_filepath):
-                    os.remove(temp_filepath)
+                # Don't delete the temp file if we're going to resume;
+                # otherwise remove it without an exists() check that could
+                # race the removal
+                if not self.enable_resume:
+                    try:
+                        os.remove(temp_filepath)
+                    except FileNotFoundError:
+                        pass
 
                 if retries >= self.retry_count - 1:
-                    # If we've exhausted retries but have resume enabled, keep the partial file
-                    if not self.enable_resume and os.path.exists(temp_filepath):
-                        os.remove(temp_filepath)
+                    # With resume enabled the partial file stays on disk
+                    # for the next run
                     raise
 
                 retries += 1
-                await asyncio.sleep(2 * (retries))  # Exponential backoff
-            finally:
-                self.connection_pool.release(url)
+                # Exponential backoff with jitter so concurrent downloads
+                # don't all retry in lockstep
+                await asyncio.sleep(min(30, 0.5 * (2 ** retries)) * (0.5 + random.random()))
 
         return bytes_downloaded  # Return how much we downloaded before failing
 
-    async def _merge_chunks(self, filepath: str, chunk_count: int) -> None:
-        """Merge downloaded chunks into the final file."""
-        try:
-            # Open the output file
-            async with aiofiles.open(filepath, 'wb') as outfile:
-                # Read and write each chunk
-                for i in range(chunk_count):
-                    chunk_path = f"{filepath}.part{i}"
-                    if os.path.exists(chunk_path):
-                        async with aiofiles.open(chunk_path, 'rb') as infile:
-                            while True:
-                                chunk = await infile.read(8192)
-                                if not chunk:
-                                    break
-                                await outfile.write(chunk)
-                        # Remove the chunk file after merging
-                        os.remove(chunk_path)
-                    else:
-                        logger.warning(f"Chunk file {chunk_path} not found during merge")
-        except Exception as e:
-            logger.error(f"Error merging chunks for {filepath}: {str(e)}")
-            raise
-
     async def download_file(self, url: str, filepath: str,
                           progress_callback: Optional[Callable[[str, float, Optional[str]], None]] = None) -> None:
         """Download a file with support for chunked downloading and resume capability."""
+        host = _split_url(url).netloc
+        sem = self._host_sems.setdefault(host, asyncio.Semaphore(self.max_concurrent))
+        async with sem:
+            await self._download_file(url, filepath, progress_callback)
+
+    async def _download_file(self, url: str, filepath: str,
+                           progress_callback: Optional[Callable[[str, float, Optional[str]], None]] = None) -> None:
+        """Run one file download while holding the host's concurrency slot."""
         retries = 0
 
+        # Create the output directory once per directory, not per attempt
+        dirpath = os.path.dirname(filepath)
+        if dirpath and dirpath not in self._dirs_created:
+            os.makedirs(dirpath, exist_ok=True)
+            self._dirs_created.add(dirpath)
+
+        # The substring scan doesn't change between retries
+        needs_auth = 'play_token' in url
+
         # Check if we have a saved state for this file
         resume_state = None
         if self.enable_resume and self.download_state:
-            resume_state = self.download_state.load_state(filepath)
+            resume_state = await self.download_state.aload_state(filepath)
             if resume_state:
                 logger.info(f"Found resume state for {filepath}, attempting to resume download")
 
         while retries < self.retry_count:
             try:
                 # Authenticate and get fresh URL if needed
-                if 'play_token' in url:
-                    url = await self.authenticator.authenticate(url)
+                if needs_auth:
+                    url = await self._authenticate(url)
 
                 # First, make a HEAD request to get file size and check if server supports range requests
-                headers = {
-                    'User-Agent': 'VLC/3.0.16 LibVLC/3.0.16',
-                    'Accept': '*/*',
-                }
+                headers = self._DEFAULT_HEADERS
 
                 supports_range = False
                 file_size = 0
 
-                await self.connection_pool.acquire(url)
-                try:
-                    async with self.session.head(url, headers=headers, allow_redirects=True) as head_response:
-                        if head_response.status == 200:
-                            file_size = int(head_response.headers.get('content-length', 0))
-                            supports_range = 'accept-ranges' in head_response.headers and head_response.headers['accept-ranges'] == 'bytes'
+                async with self.session.head(url, headers=headers, allow_redirects=True) as head_response:
+                    if head_response.status == 200:
+                        file_size = int(head_response.headers.get('content-length', 0))
+                        supports_range = 'accept-ranges' in head_response.headers and head_response.headers['accept-ranges'] == 'bytes'
 
-                            # Check if server supports range requests
-                            if 'accept-ranges' in head_response.headers:
-                                if head_response.headers['accept-ranges'] == 'bytes':
-                                    supports_range = True
-                finally:
-                    self.connection_pool.release(url)
+                        # Check if server supports range requests
+                        if 'accept-ranges' in head_response.headers:
+                            if head_response.headers['accept-ranges'] == 'bytes':
+                                supports_range = True
 
                 # Determine download strategy
                 if self.enable_chunked and supports_range and file_size > 0:
@@ -355,43 +621,92 @@ class AsyncDownloader:
                     # If we have a resume state and the file size matches, use it
                     downloaded_chunks = {}
                     if resume_state and resume_state['total_size'] == file_size and resume_state['url'] == url:
-                        downloaded_chunks = resume_state['downloaded_chunks']
-                        logger.info(f"Resuming download of {filepath} with {sum(downloaded_chunks.values())} bytes already downloaded")
+                        # Resume against the ranges the bytes were actually
+                        # written at: calculate_optimal_chunks depends on
+                        # speed history, so recomputing would skip saved
+                        # offsets inside ranges that were never written
+                        saved_ranges = [tuple(r) for r in resume_state.get('chunk_ranges') or []]
+                        if saved_ranges:
+                            chunks = saved_ranges
+                            downloaded_chunks = resume_state['downloaded_chunks']
+                            logger.info(f"Resuming download of {filepath} with {sum(downloaded_chunks.values())} bytes already downloaded")
 
                     logger.info(f"Downloading {url} in {len(chunks)} chunks")
 
-                    # Create tasks for each chunk
-                    tasks = []
-                    for i, (start, end) in enumerate(chunks):
-                        # Check if we have already downloaded some of this chunk
-                        resume_from = 0
-                        if str(i) in downloaded_chunks:
-                            resume_from = downloaded_chunks[str(i)]
-
-                        task = asyncio.create_task(
-                            self._download_chunk(
-                                url=url,
-                                filepath=filepath,
-                                start=start,
-                                end=end,
-                                chunk_id=i,
-                                total_chunks=len(chunks),
-                                total_size=file_size,
-                                progress_callback=progress_callback,
-                                resume_from=resume_from
+                    # All chunks pwrite into one shared fd at their absolute
+                    # offsets - every byte hits the disk once and there is
+                    # no merge pass at the end. Work against a temp name so
+                    # an interrupted download never leaves a full-size
+                    # garbage file at the destination. Platforms without
+                    # os.pwrite (Windows) keep per-chunk part files and
+                    # merge them after the gather instead
+                    part_path = f"{filepath}.part"
+                    out_fd = None
+                    if _HAS_PWRITE:
+                        out_fd = os.open(part_path, os.O_WRONLY | os.O_CREAT, 0o644)
+                    try:
+                        if out_fd is not None:
+                            if hasattr(os, 'posix_fadvise'):
+                                os.posix_fadvise(out_fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+                            # Reserve the full extent up-front to limit
+                            # fragmentation from interleaved chunk writes
+                            try:
+                                os.posix_fallocate(out_fd, 0, file_size)
+                            except (AttributeError, OSError):
+                                os.ftruncate(out_fd, file_size)
+
+                        # Create tasks for each chunk
+                        tasks = []
+                        for i, (start, end) in enumerate(chunks):
+                            # Check if we have already downloaded some of this chunk
+                            resume_from = 0
+                            if str(i) in downloaded_chunks:
+                                resume_from = downloaded_chunks[str(i)]
+
+                            task = asyncio.create_task(
+                                self._download_chunk(
+                                    url=url,
+                                    filepath=filepath,
+                                    start=start,
+                                    end=end,
+                                    chunk_id=i,
+                                    total_chunks=len(chunks),
+                                    total_size=file_size,
+                                    progress_callback=progress_callback,
+                                    resume_from=resume_from,
+                                    out_fd=out_fd
+                                )
                             )
-                        )
-                        tasks.append(task)
-
-                    # Wait for all chunks to download
-                    await asyncio.gather(*tasks)
-
-                    # Merge chunks into final file
-                    await self._merge_chunks(filepath, len(chunks))
+                            tasks.append(task)
+
+                        # Wait for all chunks to download
+                        try:
+                            await asyncio.gather(*tasks)
+                        except BaseException:
+                            # One chunk failing (or this task being
+                            # cancelled) must not leave siblings writing
+                            # into the descriptor the finally is about to
+                            # close - a retry could get the same fd number
+                            # back and have stale writes land in its file
+                            for task in tasks:
+                                task.cancel()
+                            await asyncio.gather(*tasks, return_exceptions=True)
+                            raise
+                    finally:
+                        if out_fd is not None:
+                            os.close(out_fd)
+
+                    if out_fd is not None:
+                        # Every chunk landed - move the finished file into place
+                        os.rename(part_path, filepath)
+                    else:
+                        # No pwrite on this platform: assemble the part
+                        # files sequentially off-loop, then rename
+                        await asyncio.to_thread(_merge_parts, filepath, len(chunks))
 
                     # Clear the download state since we've completed the download
                     if self.enable_resume and self.download_state:
-                        self.download_state.clear_state(filepath)
+                        await self.download_state.aclear_state(filepath)
                 else:
                     # Fall back to single-chunk download
                     if not self.enable_chunked:
@@ -401,11 +716,15 @@ class AsyncDownloader:
                     elif file_size <= 0:
                         logger.info(f"File size unknown, using single download")
 
-                    # Check if we have a partial download
+                    # Check if we have a partial download: one off-loop stat
+                    # instead of exists+getsize syscalls on the event loop
                     resume_from = 0
-                    if resume_state and os.path.exists(f"{filepath}.part0"):
-                        # Get the size of the partial file
-                        resume_from = os.path.getsize(f"{filepath}.part0")
+                    if resume_state:
+                        try:
+                            resume_from = await asyncio.to_thread(
+                                os.path.getsize, f"{filepath}.part0")
+                        except OSError:
+                            resume_from = 0
                         if resume_from > 0:
                             logger.info(f"Resuming single-chunk download from byte {resume_from}")
 
@@ -422,7 +741,7 @@ class AsyncDownloader:
 
                     # Clear the download state
                     if self.enable_resume and self.download_state:
-                        self.download_state.clear_state(filepath)
+                        await self.download_state.aclear_state(filepath)
 
                 # Download successful
                 return
@@ -430,23 +749,30 @@ class AsyncDownloader:
             except Exception as e:
                 logger.error(f"Download error for {url}: {str(e)}")
 
-                # If resume is enabled, don't clean up partial downloads
+                # If resume is enabled, keep the partial downloads so the
+                # next attempt can continue with a Range request
                 if not self.enable_resume:
-                    # Clean up any partial downloads
+                    # Clean up any partial downloads; removal tolerates
+                    # files that are already gone rather than racing an
+                    # exists() check
                     for i in range(self.max_chunks):
-                        chunk_path = f"{filepath}.part{i}"
-                        if os.path.exists(chunk_path):
-                            os.remove(chunk_path)
+                        try:
+                            os.remove(f"{filepath}.part{i}")
+                        except FileNotFoundError:
+                            pass
 
-                    if os.path.exists(filepath):
-                        os.remove(filepath)
+                    for leftover in (f"{filepath}.part", filepath):
+                        try:
+                            os.remove(leftover)
+                        except FileNotFoundError:
+                            pass
 
                 if retries >= self.retry_count - 1:
                     raise
 
                 retries += 1
-                # Exponential backoff
-                await asyncio.sleep(2 ** retries)
+                # Exponential backoff with jitter
+                await asyncio.sleep(min(30, 0.5 * (2 ** retries)) * (0.5 + random.random()))
 
                 # Handle server errors by adjusting rate limiting
                 self.optimizer.handle_server_error(url)
@@ -473,17 +799,85 @@ class DownloadManager:
         self.max_speed_limit = max_speed_limit
         self.enable_resume = enable_resume
         self.enable_chunked = enable_chunked
-        self.executor = ThreadPoolExecutor(max_workers=max_concurrent)
         self.download_state = DownloadState() if enable_resume else None
         self.active_downloader = None
         self.paused = False
         self.current_downloads = []  # Track current downloads for pause/resume
         self.future = None  # Store the future for the current download task
 
+        # Use uvloop when available - a drop-in libuv loop that roughly
+        # halves socket-read overhead for aiohttp workloads
+        try:
+            import uvloop
+            uvloop.install()
+        except ImportError:
+            pass
+
+        # Run all downloads on one persistent event loop so the session,
+        # DNS cache and keep-alive pool survive across batches
+        self._loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(target=self._run_loop, daemon=True)
+        self._loop_thread.start()
+        self._downloader = None
+
+    def _run_loop(self):
+        """Run the dedicated download event loop until shutdown."""
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    async def _ensure_downloader(self) -> 'AsyncDownloader':
+        """Lazily create the long-lived AsyncDownloader (and its session)."""
+        if self._downloader is None:
+            downloader = AsyncDownloader(
+                self.max_concurrent,
+                self.max_chunks,
+                self.max_speed_limit,
+                self.enable_resume,
+                self.enable_chunked
+            )
+            self._downloader = await downloader.__aenter__()
+        return self._downloader
+
     def set_speed_limit(self, limit_bytes_per_sec: Optional[int]) -> None:
         """Set a global speed limit for all downloads in bytes per second."""
         self.max_speed_limit = limit_bytes_per_sec
 
+    def reconfigure(self,
+                    max_concurrent: int = 3,
+                    max_chunks: int = 4,
+                    max_speed_limit: Optional[int] = None,
+                    enable_resume: bool = True,
+                    enable_chunked: bool = True) -> None:
+        """
+        Apply new settings in place, keeping the event loop, session and
+        keep-alive pool alive instead of tearing everything down and
+        re-instantiating on every settings change.
+        """
+        self.max_concurrent = max_concurrent
+        self.max_chunks = max_chunks if enable_chunked else 1
+        self.max_speed_limit = max_speed_limit
+        self.enable_resume = enable_resume
+        self.enable_chunked = enable_chunked
+        if enable_resume and self.download_state is None:
+            self.download_state = DownloadState()
+
+        # Push the changes into the long-lived downloader if it exists;
+        # worker counts are sized per batch so they pick up the new
+        # concurrency on the next start_downloads call
+        downloader = self._downloader
+        if downloader is not None:
+            downloader.max_concurrent = max_concurrent
+            downloader.max_chunks = self.max_chunks
+            downloader.enable_resume = enable_resume
+            downloader.enable_chunked = enable_chunked
+            downloader.download_state = self.download_state if enable_resume else None
+            downloader.optimizer.set_speed_limit(max_speed_limit)
+            # Per-host gates were sized from the old concurrency
+            downloader._host_sems.clear()
+            # Start or cancel the background state saver to match the new
+            # resume setting; it was previously only spawned in __aenter__
+            self._loop.call_soon_threadsafe(downloader._sync_state_saver)
+
     def get_incomplete_downloads(self) -> List[Dict]:
         """Get a list of all incomplete downloads that can be resumed."""
         if self.enable_resume and self.download_state:
@@ -518,75 +912,81 @@ class DownloadManager:
         self.paused = False
 
         async def run_downloads():
-            # Create a new downloader instance
-            downloader = AsyncDownloader(
-                self.max_concurrent,
-                self.max_chunks,
-                self.max_speed_limit,
-                self.enable_resume,
-                self.enable_chunked
-            )
+            # Reuse the long-lived downloader (and its session) across batches
+            downloader = await self._ensure_downloader()
 
             # Store reference to active downloader for status updates
             self.active_downloader = downloader
 
-            async with downloader:
-                tasks = []
-                for url, filepath in downloads:
-                    task = asyncio.create_task(
-                        downloader.download_file(url, filepath, progress_callback)
-                    )
-                    tasks.append(task)
-
-                # Wait for all tasks to complete or until paused/stopped
-                try:
-                    await asyncio.gather(*tasks, return_exceptions=True)
-                except asyncio.CancelledError:
-                    # Handle cancellation (pause or stop)
-                    logger.info("Downloads were cancelled")
-                    # Save state for all active downloads if paused
-                    if self.paused and self.enable_resume and self.download_state:
-                        for key, info in downloader.active_downloads.items():
-                            filepath = info['filepath']
-                            url = info['url']
-                            # Save download state for resuming later
-                            if filepath and url:
-                                # Collect chunk progress
-                                downloaded_chunks = {}
-                                for k, data in downloader.active_downloads.items():
-                                    if k.startswith(f"{filepath}_"):
-                                        chunk_id = data['chunk_id']
-                                        downloaded_chunks[chunk_id] = data['bytes_downloaded']
-
-                                # Only save if we have progress
-                                if downloaded_chunks:
-                                    self.download_state.save_state(
-                                        filepath=filepath,
-                                        url=url,
-                                        downloaded_chunks=downloaded_chunks,
-                                        total_size=info.get('total_size', 0),
-                                        chunk_ranges=[]  # Will be recalculated on resume
-                                    )
-
-                    # Cancel all tasks
-                    for task in tasks:
-                        if not task.done():
-                            task.cancel()
-
-                    # Wait for tasks to be cancelled
-                    await asyncio.gather(*tasks, return_exceptions=True)
-
-            # Clear reference when done
-            self.active_downloader = None
-
-        def run_async_downloads():
+            # Feed the files through a queue drained by a fixed pool of
+            # workers, so a 10k-entry playlist schedules max_concurrent
+            # tasks instead of 10k up-front
+            queue = asyncio.Queue()
+            for item in downloads:
+                queue.put_nowait(item)
+
+            async def worker():
+                while True:
+                    try:
+                        url, filepath = queue.get_nowait()
+                    except asyncio.QueueEmpty:
+                        return
+                    try:
+                        await downloader.download_file(url, filepath, progress_callback)
+                    except Exception as e:
+                        logger.error(f"Download failed for {url}: {str(e)}")
+                    finally:
+                        queue.task_done()
+
+            tasks = [
+                asyncio.create_task(worker())
+                for _ in range(max(1, min(self.max_concurrent, len(downloads))))
+            ]
+
+            # Wait for all workers to complete or until paused/stopped
             try:
-                asyncio.run(run_downloads())
-            except Exception as e:
-                logger.error(f"Error in download thread: {str(e)}")
+                await asyncio.gather(*tasks, return_exceptions=True)
+            except asyncio.CancelledError:
+                # Handle cancellation (pause or stop)
+                logger.info("Downloads were cancelled")
+                # Save state for all active downloads if paused
+                if self.paused and self.enable_resume and self.download_state:
+                    for filepath, file_chunks in downloader.active_downloads.items():
+                        if not filepath or not file_chunks:
+                            continue
+
+                        # Collect chunk progress for this file
+                        downloaded_chunks = {
+                            cid: data['bytes_downloaded']
+                            for cid, data in file_chunks.items()
+                        }
+
+                        # Only save if we have progress
+                        if downloaded_chunks:
+                            any_chunk = next(iter(file_chunks.values()))
+                            await self.download_state.asave_state(
+                                filepath=filepath,
+                                url=any_chunk['url'],
+                                downloaded_chunks=downloaded_chunks,
+                                total_size=any_chunk.get('file_size', 0),
+                                chunk_ranges=[(data['start'], data['end'])
+                                              for data in file_chunks.values()],
+                                force=True
+                            )
+
+                # Cancel all tasks
+                for task in tasks:
+                    if not task.done():
+                        task.cancel()
+
+                # Wait for tasks to be cancelled
+                await asyncio.gather(*tasks, return_exceptions=True)
+            finally:
+                # Clear reference when done
+                self.active_downloader = None
 
         # Store the future for cancellation
-        self.future = self.executor.submit(run_async_downloads)
+        self.future = asyncio.run_coroutine_threadsafe(run_downloads(), self._loop)
 
     def pause_downloads(self):
         """Pause all active downloads."""
@@ -631,31 +1031,26 @@ class DownloadManager:
 
         # If we have an active downloader, get its active downloads
         if hasattr(self, 'active_downloader') and self.active_downloader:
-            # Process active downloads to extract speed information
-            for key, info in self.active_downloader.active_downloads.items():
-                filepath = info['filepath']
+            # Combine the chunks of each file into a single entry
+            for filepath, file_chunks in self.active_downloader.active_downloads.items():
+                if not file_chunks:
+                    continue
+
+                any_chunk = next(iter(file_chunks.values()))
 
                 # Get speed from optimizer if available
                 speed = 0
                 if hasattr(self.active_downloader, 'optimizer'):
-                    speed = self.active_downloader.optimizer.get_download_speed(info['url']) or 0
-
-                # Combine information from multiple chunks for the same file
-                if filepath in result:
-                    # Update existing entry
-                    result[filepath]['bytes_downloaded'] += info['bytes_downloaded']
-                    # Use max speed from chunks
-                    if speed > result[filepath].get('speed', 0):
-                        result[filepath]['speed'] = speed
-                else:
-                    # Create new entry
-                    result[filepath] = {
-                        'url': info['url'],
-                        'bytes_downloaded': info['bytes_downloaded'],
-                        'total_size': info.get('total_size', 0),
-                        'speed': speed,
-                        'paused': self.paused
-                    }
+                    speed = self.active_downloader.optimizer.get_download_speed(any_chunk['url']) or 0
+
+                result[filepath] = {
+                    'url': any_chunk['url'],
+                    'bytes_downloaded': sum(data['bytes_downloaded']
+                                            for data in file_chunks.values()),
+                    'total_size': any_chunk.get('total_size', 0),
+                    'speed': speed,
+                    'paused': self.paused
+                }
 
         return result
 
@@ -671,4 +1066,16 @@ class DownloadManager:
         """Shutdown the download manager and cancel any pending downloads."""
         # Stop any active downloads
         self.stop_downloads()
-        self.executor.shutdown(wait=False)
\ No newline at end of file
+
+        # Close the long-lived downloader (and its session) on its own loop
+        if self._downloader:
+            future = asyncio.run_coroutine_threadsafe(
+                self._downloader.__aexit__(None, None, None), self._loop
+            )
+            try:
+                future.result(timeout=5)
+            except Exception as e:
+                logger.error(f"Error closing downloader: {str(e)}")
+            self._downloader = None
+
+        self._loop.call_soon_threadsafe(self._loop.stop)
\ No newline at end of file
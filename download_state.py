@@ -1,8 +1,24 @@
+import asyncio
 import os
-import json
 import time
 from typing import Dict, List, Optional, Any
 
+# orjson serializes several times faster than the stdlib and emits bytes
+# directly; fall back silently when it isn't installed
+try:
+    import orjson
+    _dumps = orjson.dumps
+    _loads = orjson.loads
+    _DecodeError = orjson.JSONDecodeError
+except ImportError:
+    import json
+
+    def _dumps(obj):
+        return json.dumps(obj).encode()
+
+    _loads = json.loads
+    _DecodeError = json.JSONDecodeError
+
 class DownloadState:
     """Class to manage download state persistence for resumable downloads."""
     
@@ -15,6 +31,18 @@ class DownloadState:
         """
         self.state_dir = state_dir
         os.makedirs(state_dir, exist_ok=True)
+        # Per-file write throttle so rapid checkpointing coalesces into at
+        # most one encode+write per interval
+        self._last_save: Dict[str, float] = {}
+        self._min_save_interval = 2.0
+        # Append-only index of state files (with tombstones for cleared
+        # ones) so the incomplete-download scan is one sequential read
+        # instead of opening every .state file in the directory
+        self._index_path = os.path.join(state_dir, "_index.jsonl")
+        self._indexed: set = set()
+        # Per-file locks for the async wrappers, so concurrent coroutines
+        # can't interleave writes to the same state file
+        self._path_locks: Dict[str, asyncio.Lock] = {}
     
     def _get_state_path(self, filepath: str) -> str:
         """Get the path to the state file for a download."""
@@ -22,30 +50,78 @@ class DownloadState:
         safe_name = filepath.replace('/', '_').replace('\\', '_').replace(':', '_')
         return os.path.join(self.state_dir, f"{safe_name}.state")
     
-    def save_state(self, filepath: str, url: str, downloaded_chunks: Dict[int, int], 
-                  total_size: int, chunk_ranges: List[tuple]) -> None:
+    def save_state(self, filepath: str, url: str, downloaded_chunks: Dict[int, int],
+                  total_size: int, chunk_ranges: List[tuple], force: bool = False) -> None:
         """
         Save the download state for resuming later.
-        
+
         Args:
             filepath: Path to the file being downloaded
             url: URL being downloaded
             downloaded_chunks: Dict mapping chunk_id to bytes downloaded
             total_size: Total size of the file
             chunk_ranges: List of (start, end) tuples for each chunk
+            force: Write even if this file was saved within the throttle
+                interval (use on pause/error so no progress is dropped)
         """
+        now = time.monotonic()
+        if not force and now - self._last_save.get(filepath, 0.0) < self._min_save_interval:
+            return
+
         state = {
             'filepath': filepath,
             'url': url,
-            'downloaded_chunks': downloaded_chunks,
+            # Stringify chunk ids so int and str keys serialize the same way
+            'downloaded_chunks': {str(k): v for k, v in downloaded_chunks.items()},
             'total_size': total_size,
             'chunk_ranges': chunk_ranges,
             'timestamp': time.time()
         }
-        
+
+        # Write to a temp file and rename into place so a crash mid-write
+        # never leaves a truncated state file behind
         state_path = self._get_state_path(filepath)
-        with open(state_path, 'w') as f:
-            json.dump(state, f)
+        tmp_path = state_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(_dumps(state))
+        os.replace(tmp_path, state_path)
+        self._last_save[filepath] = now
+
+        # Index each file once per session; repeats are deduped on read
+        if filepath not in self._indexed:
+            self._append_index({'filepath': filepath, 'state_path': state_path})
+            self._indexed.add(filepath)
+
+    async def asave_state(self, filepath: str, url: str, downloaded_chunks: Dict[int, int],
+                          total_size: int, chunk_ranges: List[tuple], force: bool = False) -> None:
+        """
+        Async save_state: runs the encode and write on a worker thread so
+        the event loop never blocks on disk, with a per-file lock so
+        concurrent coroutines can't interleave writes to one state file.
+        The sync method stays for callers off the loop.
+        """
+        lock = self._path_locks.setdefault(filepath, asyncio.Lock())
+        async with lock:
+            await asyncio.to_thread(self.save_state, filepath, url,
+                                    downloaded_chunks, total_size,
+                                    chunk_ranges, force)
+
+    async def aload_state(self, filepath: str) -> Optional[Dict[str, Any]]:
+        """Async load_state; see asave_state."""
+        lock = self._path_locks.setdefault(filepath, asyncio.Lock())
+        async with lock:
+            return await asyncio.to_thread(self.load_state, filepath)
+
+    async def aclear_state(self, filepath: str) -> None:
+        """Async clear_state; see asave_state."""
+        lock = self._path_locks.setdefault(filepath, asyncio.Lock())
+        async with lock:
+            await asyncio.to_thread(self.clear_state, filepath)
+
+    def _append_index(self, record: Dict[str, Any]) -> None:
+        """Append one record to the index file."""
+        with open(self._index_path, 'ab') as f:
+            f.write(_dumps(record) + b'\n')
     
     def load_state(self, filepath: str) -> Optional[Dict[str, Any]]:
         """
@@ -62,14 +138,14 @@ class DownloadState:
             return None
             
         try:
-            with open(state_path, 'r') as f:
-                state = json.load(f)
-                
+            with open(state_path, 'rb') as f:
+                state = _loads(f.read())
+
             # Validate the state
             required_keys = ['filepath', 'url', 'downloaded_chunks', 'total_size', 'chunk_ranges']
             if all(key in state for key in required_keys):
                 return state
-        except (json.JSONDecodeError, IOError) as e:
+        except (_DecodeError, IOError) as e:
             print(f"Error loading download state: {e}")
             
         return None
@@ -81,9 +157,12 @@ class DownloadState:
         Args:
             filepath: Path to the file
         """
+        self._last_save.pop(filepath, None)
+        self._indexed.discard(filepath)
         state_path = self._get_state_path(filepath)
         if os.path.exists(state_path):
             os.remove(state_path)
+            self._append_index({'filepath': filepath, 'deleted': True})
     
     def get_incomplete_downloads(self) -> List[Dict[str, Any]]:
         """
@@ -93,17 +172,54 @@ class DownloadState:
             List of download state dicts
         """
         incomplete = []
-        
+
         if not os.path.exists(self.state_dir):
             return incomplete
-            
-        for filename in os.listdir(self.state_dir):
-            if filename.endswith('.state'):
-                try:
-                    with open(os.path.join(self.state_dir, filename), 'r') as f:
-                        state = json.load(f)
-                        incomplete.append(state)
-                except (json.JSONDecodeError, IOError):
-                    continue
-                    
+
+        # One sequential read of the index replaces opening every .state
+        # file; later records win, tombstones drop cleared downloads
+        entries: Dict[str, str] = {}
+        tombstones = 0
+        try:
+            with open(self._index_path, 'rb') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = _loads(line)
+                    except _DecodeError:
+                        continue
+                    if record.get('deleted'):
+                        entries.pop(record['filepath'], None)
+                        tombstones += 1
+                    else:
+                        entries[record['filepath']] = record['state_path']
+        except IOError:
+            # Directories from before the index existed: full scan
+            for filename in os.listdir(self.state_dir):
+                if filename.endswith('.state'):
+                    try:
+                        with open(os.path.join(self.state_dir, filename), 'rb') as f:
+                            incomplete.append(_loads(f.read()))
+                    except (_DecodeError, IOError):
+                        continue
+            return incomplete
+
+        for state_path in entries.values():
+            try:
+                with open(state_path, 'rb') as f:
+                    incomplete.append(_loads(f.read()))
+            except (_DecodeError, IOError):
+                continue
+
+        # Compact once tombstones outnumber live entries
+        if tombstones > len(entries):
+            tmp_path = self._index_path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                for filepath, state_path in entries.items():
+                    f.write(_dumps({'filepath': filepath,
+                                    'state_path': state_path}) + b'\n')
+            os.replace(tmp_path, self._index_path)
+
         return incomplete
@@ -1,42 +1,62 @@
 import os
-import re
-from typing import Optional
+from typing import Optional, Set
 from urllib.parse import urlparse
 
+# Invalid filename characters plus all ASCII control characters, stripped
+# in a single C-level translate pass
+_BAD_CHARS = '<>:"/\\|?*' + ''.join(chr(c) for c in range(32))
+_TRANS_TABLE = str.maketrans('', '', _BAD_CHARS)
+
+# Common video extensions, built once instead of per call
+VIDEO_EXTENSIONS = frozenset({'.mp4', '.mkv', '.avi', '.mov', '.wmv',
+                              '.flv', '.m4v', '.ts'})
+
 def sanitize_filename(filename: str) -> str:
     """Remove invalid characters from filename."""
-    # Remove invalid characters
-    filename = re.sub(r'[<>:"/\\|?*]', '', filename)
-    # Remove control characters
-    filename = "".join(char for char in filename if ord(char) >= 32)
-    return filename.strip()
+    return filename.translate(_TRANS_TABLE).strip()
 
 def get_extension_from_url(url: str) -> str:
     """Get file extension from URL or content type."""
-    # Common video extensions
-    VIDEO_EXTENSIONS = {'.mp4', '.mkv', '.avi', '.mov', '.wmv', '.flv', '.m4v', '.ts'}
-    
+    # A path with no dot can't carry an extension - skip the parse
+    path_part = url.partition('?')[0]
+    if '.' not in path_part:
+        return '.mp4'
+
     # Try to get extension from URL
-    parsed_url = urlparse(url)
-    path = parsed_url.path
-    ext = os.path.splitext(path)[1].lower()
-    
+    ext = os.path.splitext(urlparse(path_part).path)[1].lower()
+
     # If valid video extension found, return it
     if ext in VIDEO_EXTENSIONS:
         return ext
-    
+
     # Default to .mp4 if no valid extension found
     return '.mp4'
 
-def ensure_unique_filename(base_path: str, filename: str) -> str:
-    """Ensure filename is unique by adding number if necessary."""
+def ensure_unique_filename(base_path: str, filename: str,
+                           existing: Optional[Set[str]] = None) -> str:
+    """
+    Ensure filename is unique by adding number if necessary.
+
+    Collisions are probed against an in-memory set of basenames - one
+    scandir instead of a stat syscall per candidate. Callers resolving a
+    whole batch can pass a shared ``existing`` set; names picked here are
+    added to it so batch entries can't collide with each other either.
+    """
+    if existing is None:
+        try:
+            existing = {entry.name for entry in os.scandir(base_path)}
+        except FileNotFoundError:
+            existing = set()
+
+    if filename not in existing:
+        existing.add(filename)
+        return os.path.join(base_path, filename)
+
     name, ext = os.path.splitext(filename)
     counter = 1
-    final_path = os.path.join(base_path, filename)
-    
-    while os.path.exists(final_path):
-        new_filename = f"{name}_{counter}{ext}"
-        final_path = os.path.join(base_path, new_filename)
+    while f"{name}_{counter}{ext}" in existing:
         counter += 1
-        
-    return final_path
\ No newline at end of file
+
+    new_filename = f"{name}_{counter}{ext}"
+    existing.add(new_filename)
+    return os.path.join(base_path, new_filename)
\ No newline at end of file
@@ -6,13 +6,37 @@ from PyQt6.QtCore import Qt, QThread, pyqtSignal, QTimer
 from PyQt6.QtGui import QFont, QPalette, QColor, QIcon, QAction
 import os
 import sys
-from typing import Dict, List, Optional
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 from m3u_parser import M3UParser, M3UEntry
 from async_downloader import DownloadManager
 from file_utils import ensure_unique_filename
 from utils import get_extension_from_url, format_speed, format_status
 
+class _ParseWorker(QThread):
+    """Parses an M3U file off the Qt thread and reports back via signals."""
+    finished_entries = pyqtSignal(list)
+    failed = pyqtSignal(str)
+
+    def __init__(self, path: str, parent=None):
+        super().__init__(parent)
+        self._path = path
+
+    def run(self):
+        try:
+            self.finished_entries.emit(M3UParser.parse(self._path))
+        except Exception as e:
+            self.failed.emit(str(e))
+
 class M3UDownloaderGUI(QMainWindow):
+    # Queued signal that carries worker-thread progress onto the Qt thread
+    progress_signal = pyqtSignal(str, float, str)
+
+    # Pre-formatted status rows from the status worker thread; the Qt-side
+    # slot only sets text
+    status_rows_signal = pyqtSignal(list)
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("M3U Downloader")
@@ -25,10 +49,27 @@ class M3UDownloaderGUI(QMainWindow):
         # Track active downloads
         self.active_downloads = {}
 
-        # Create a timer to update download status
+        # Map downloaded basenames to their tree rows so progress updates
+        # are O(1) lookups instead of scanning every row
+        self._item_by_file: Dict[str, QTreeWidgetItem] = {}
+
+        # Parsed playlist entries keyed by URL, filled on playlist load
+        self._entry_by_url: Dict[str, M3UEntry] = {}
+
+        # Last (emit time, progress) per file, used to drop redundant
+        # progress reports before they cross into the Qt thread
+        self._last_progress: Dict[str, Tuple[float, float]] = {}
+        self.progress_signal.connect(self._apply_progress)
+
+        # Timer for download status sweeps; only runs while a batch is
+        # active (started on download/resume, stopped when drained) so an
+        # idle app costs nothing. The sweep itself snapshots and formats
+        # on a worker thread and hands the Qt thread ready-made strings
         self.status_timer = QTimer()
         self.status_timer.timeout.connect(self.update_download_status)
-        self.status_timer.start(500)  # Update every 500ms
+        self._status_pool = ThreadPoolExecutor(max_workers=1)
+        self._status_inflight = False
+        self.status_rows_signal.connect(self._apply_status_rows)
 
         # Setup system tray
         self.setup_tray()
@@ -145,6 +186,11 @@ class M3UDownloaderGUI(QMainWindow):
         self.tree.setColumnWidth(2, 100)
         self.tree.setColumnWidth(3, 100)
         self.tree.setSelectionMode(QTreeWidget.SelectionMode.ExtendedSelection)
+        # The list is flat with identical row heights; telling the view so
+        # lets it compute layout from one row instead of measuring all of
+        # them, which is what makes 50k-row playlists scroll smoothly
+        self.tree.setUniformRowHeights(True)
+        self.tree.setRootIsDecorated(False)
 
         list_layout.addWidget(self.tree)
 
@@ -270,15 +316,37 @@ class M3UDownloaderGUI(QMainWindow):
             QMessageBox.warning(self, "Error", "Please select an M3U file first")
             return
 
+        # Parse in a worker thread so multi-thousand-entry playlists
+        # don't freeze the window; the result arrives via queued signal
+        self.statusBar().showMessage("Loading playlist...")
+        self._parse_worker = _ParseWorker(m3u_file, self)
+        self._parse_worker.finished_entries.connect(self._on_m3u_parsed)
+        self._parse_worker.failed.connect(self._on_m3u_parse_failed)
+        self._parse_worker.start()
+
+    def _on_m3u_parsed(self, entries: list):
+        self.entries = entries
+        # Insert the whole playlist in one batch with repaints held
+        # off - per-item addTopLevelItem relayouts make large lists
+        # take seconds to appear
+        self.tree.setUpdatesEnabled(False)
         try:
-            self.entries = M3UParser.parse(m3u_file)
             self.tree.clear()
-            for entry in self.entries:
-                item = QTreeWidgetItem([entry.title, entry.url, "Pending", ""])
-                self.tree.addTopLevelItem(item)
-            self.statusBar().showMessage(f"Loaded {len(self.entries)} items")
-        except Exception as e:
-            QMessageBox.critical(self, "Error", str(e))
+            self._item_by_file.clear()
+            self.tree.addTopLevelItems([
+                QTreeWidgetItem((entry.title, entry.url, "Pending", ""))
+                for entry in self.entries
+            ])
+        finally:
+            self.tree.setUpdatesEnabled(True)
+        # Look up entries by URL so download clicks reuse the extension
+        # the parser already computed
+        self._entry_by_url = {entry.url: entry for entry in self.entries}
+        self.statusBar().showMessage(f"Loaded {len(self.entries)} items")
+
+    def _on_m3u_parse_failed(self, message: str):
+        self.statusBar().showMessage("Ready")
+        QMessageBox.critical(self, "Error", message)
 
     def download_selected(self):
         selected_items = self.tree.selectedItems()
@@ -288,11 +356,13 @@ class M3UDownloaderGUI(QMainWindow):
         self._start_download(selected_items)
 
     def download_all(self):
-        all_items = [self.tree.topLevelItem(i) for i in range(self.tree.topLevelItemCount())]
-        if not all_items:
+        count = self.tree.topLevelItemCount()
+        if not count:
             QMessageBox.information(self, "Info", "No items to download")
             return
-        self._start_download(all_items)
+        # Feed rows lazily; _start_download makes its single pass without
+        # an up-front item list being materialized here
+        self._start_download(self.tree.topLevelItem(i) for i in range(count))
 
     def _create_download_manager(self):
         """Create a download manager with current settings."""
@@ -311,8 +381,9 @@ class M3UDownloaderGUI(QMainWindow):
             # Get resume setting
             enable_resume = self.resume_checkbox.isChecked()
 
-            # Create download manager with settings
-            self.download_manager = DownloadManager(
+            # Reconfigure the existing manager in place so its event loop,
+            # session and keep-alive pool survive across clicks
+            self.download_manager.reconfigure(
                 max_concurrent=max_concurrent,
                 max_chunks=max_chunks,
                 max_speed_limit=speed_limit,
@@ -348,36 +419,6 @@ class M3UDownloaderGUI(QMainWindow):
         if not self._create_download_manager():
             return
 
-        # Get progress callback
-        def update_progress(filename: str, progress: float, speed: Optional[str] = None):
-            # Check if the file is already in the tree
-            found = False
-            for i in range(self.tree.topLevelItemCount()):
-                item = self.tree.topLevelItem(i)
-                if item.text(0) == filename:
-                    status_text = format_status(progress)
-                    item.setText(2, status_text)
-
-                    # Set green color for finished downloads
-                    if progress >= 100:
-                        item.setForeground(2, QColor("green"))
-                        item.setText(3, "")
-                    else:
-                        # Reset color for in-progress downloads
-                        item.setForeground(2, QColor("black"))
-                        if speed:
-                            item.setText(3, speed)
-                    found = True
-                    break
-
-            # If not found, add it to the tree
-            if not found:
-                item = QTreeWidgetItem([filename, "Resuming...", format_status(progress), speed or ""])
-                self.tree.addTopLevelItem(item)
-                # Set color if needed
-                if progress >= 100:
-                    item.setForeground(2, QColor("green"))
-
         # Get incomplete downloads
         incomplete = self.download_manager.get_incomplete_downloads()
         if not incomplete:
@@ -394,8 +435,9 @@ class M3UDownloaderGUI(QMainWindow):
 
         if confirm == QMessageBox.StandardButton.Yes:
             try:
-                self.download_manager.resume_all_downloads(progress_callback=update_progress)
+                self.download_manager.resume_all_downloads(progress_callback=self._emit_progress)
                 self.statusBar().showMessage(f"Resuming {len(incomplete)} downloads...")
+                self.status_timer.start(500)
 
                 # Enable control buttons
                 self.pause_btn.setEnabled(True)
@@ -416,36 +458,34 @@ class M3UDownloaderGUI(QMainWindow):
         if not self._create_download_manager():
             return
 
-        downloads = []
-        for item in items:
-            url = item.text(1)
-            filename = f"{item.text(0)}{get_extension_from_url(url)}"
-            filepath = ensure_unique_filename(output_dir, filename)
-            downloads.append((url, filepath))
-            item.setText(2, "Queued")
-            item.setText(3, "")
+        # One directory snapshot shared by the whole batch, so uniqueness
+        # checks are set lookups instead of a stat per candidate name
+        existing_names = {entry.name for entry in os.scandir(output_dir)}
 
-        def update_progress(filename: str, progress: float, speed: Optional[str] = None):
-            for i in range(self.tree.topLevelItemCount()):
-                item = self.tree.topLevelItem(i)
-                if item.text(0) == filename:
-                    status_text = format_status(progress)
-                    item.setText(2, status_text)
-
-                    # Set green color for finished downloads
-                    if progress >= 100:
-                        item.setForeground(2, QColor("green"))
-                        item.setText(3, "")
-                    else:
-                        # Reset color for in-progress downloads
-                        item.setForeground(2, QColor("black"))
-                        if speed:
-                            item.setText(3, speed)
-                    break
+        # Hold repaints while every queued row is relabelled, so a large
+        # selection triggers one update instead of two per item
+        downloads = []
+        self.tree.setUpdatesEnabled(False)
+        try:
+            for item in items:
+                url = item.text(1)
+                entry = self._entry_by_url.get(url)
+                ext = entry.ext if entry else get_extension_from_url(url)
+                filename = f"{item.text(0)}{ext}"
+                filepath = ensure_unique_filename(output_dir, filename,
+                                                  existing=existing_names)
+                downloads.append((url, filepath))
+                # Index the row by the basename progress callbacks report
+                self._item_by_file[os.path.basename(filepath)] = item
+                item.setText(2, "Queued")
+                item.setText(3, "")
+        finally:
+            self.tree.setUpdatesEnabled(True)
 
         try:
-            self.download_manager.start_downloads(downloads, progress_callback=update_progress)
+            self.download_manager.start_downloads(downloads, progress_callback=self._emit_progress)
             self.statusBar().showMessage(f"Downloading {len(downloads)} files...")
+            self.status_timer.start(500)
 
             # Enable control buttons
             self.pause_btn.setEnabled(True)
@@ -454,6 +494,46 @@ class M3UDownloaderGUI(QMainWindow):
         except Exception as e:
             QMessageBox.critical(self, "Download Error", f"Failed to start downloads: {str(e)}")
 
+    def _emit_progress(self, filename: str, progress: float, speed: Optional[str] = None):
+        """
+        Forward a worker-thread progress report to the Qt thread.
+
+        Qt queues the signal across threads; reports that moved less than
+        half a percent within 100ms are dropped here, capping main-thread
+        wakeups at ~10Hz per file no matter how fast chunks arrive.
+        Terminal updates always go through.
+        """
+        if progress < 100:
+            now = time.monotonic()
+            last = self._last_progress.get(filename)
+            if last and now - last[0] < 0.1 and progress - last[1] < 0.5:
+                return
+            self._last_progress[filename] = (now, progress)
+        else:
+            self._last_progress.pop(filename, None)
+        self.progress_signal.emit(filename, progress, speed or "")
+
+    def _apply_progress(self, filename: str, progress: float, speed: str):
+        """Update a download's tree row; runs on the Qt thread."""
+        item = self._item_by_file.get(filename)
+        if item is None:
+            # Resumed files aren't in the tree yet; add a row on first report
+            item = QTreeWidgetItem([filename, "Resuming...", format_status(progress), speed])
+            self.tree.addTopLevelItem(item)
+            self._item_by_file[filename] = item
+
+        item.setText(2, format_status(progress))
+
+        # Set green color for finished downloads
+        if progress >= 100:
+            item.setForeground(2, QColor("green"))
+            item.setText(3, "")
+        else:
+            # Reset color for in-progress downloads
+            item.setForeground(2, QColor("black"))
+            if speed:
+                item.setText(3, speed)
+
     def toggle_chunks_enabled(self, state):
         """Enable or disable the chunks spinbox based on checkbox state."""
         self.chunks_spin.setEnabled(state)
@@ -462,45 +542,77 @@ class M3UDownloaderGUI(QMainWindow):
             self.chunks_spin.setValue(1)
 
     def update_download_status(self):
-        """Update the status and speed of active downloads in the UI."""
-        # Get active downloads from the download manager
-        active_downloads = self.download_manager.get_active_downloads()
+        """Kick off a status sweep; formatting happens off the Qt thread."""
+        # Skip the tick if the previous sweep hasn't come back yet
+        if self._status_inflight:
+            return
+        self._status_inflight = True
+        self._status_pool.submit(self._collect_status_rows)
 
+    def _collect_status_rows(self):
+        """Snapshot active downloads and pre-format their display strings.
+
+        Runs on the status worker thread so format_speed and the basename
+        splits never execute inside the Qt event loop; the result crosses
+        back as a list of (basename, speed_text, paused) rows.
+        """
+        try:
+            active_downloads = self.download_manager.get_active_downloads()
+            rows = []
+            for filepath, download_info in active_downloads.items():
+                speed = download_info.get('speed', 0)
+                paused = download_info.get('paused', False)
+                speed_str = format_speed(speed) if speed > 0 and not paused else ""
+                rows.append((os.path.basename(filepath), speed_str, paused))
+            self.status_rows_signal.emit(rows)
+        finally:
+            self._status_inflight = False
+
+    def _apply_status_rows(self, rows: list):
+        """Write pre-formatted status rows into the tree; runs on the Qt thread."""
         # Update control buttons based on download status
         self.update_control_buttons()
 
-        if not active_downloads:
+        if not rows:
+            # Stop polling once the batch has drained; the next download
+            # or resume restarts the timer
+            future = self.download_manager.future
+            if not self.download_manager.is_paused() and (future is None or future.done()):
+                self.status_timer.stop()
             return
 
-        # Update the UI for each active download
-        for filepath, download_info in active_downloads.items():
-            filename = os.path.basename(filepath)
-
-            # Find the item in the tree
-            for i in range(self.tree.topLevelItemCount()):
-                item = self.tree.topLevelItem(i)
-                if item.text(0) == filename or filename.startswith(item.text(0)):
-                    # Update status if it's still "Queued"
-                    if item.text(2) == "Queued":
-                        item.setText(2, "Downloading...")
-                        item.setForeground(2, QColor("black"))
-
-                    # Update status if download is paused
-                    if 'paused' in download_info and download_info['paused'] and item.text(2) != "Paused":
-                        item.setText(2, "Paused")
-                        item.setForeground(2, QColor("orange"))
-
-                    # Check if download is finished
-                    if item.text(2) == "Finished":
-                        item.setForeground(2, QColor("green"))
-
-                    # Update speed if available
-                    if 'speed' in download_info and download_info['speed'] > 0 and not download_info.get('paused', False):
-                        speed_str = format_speed(download_info['speed'])
-                        item.setText(3, speed_str)
-                    elif download_info.get('paused', False):
-                        item.setText(3, "")
-                    break
+        # Tighten the poll as more downloads run so the view stays fresh,
+        # bounded at 50ms
+        self.status_timer.setInterval(max(50, 500 // len(rows)))
+
+        # Rows come straight from the filename index instead of scanning
+        # the tree per download
+        for basename, speed_str, paused in rows:
+            item = self._item_by_file.get(basename)
+            if item is None:
+                continue
+
+            # Update status if it's still "Queued"
+            if item.text(2) == "Queued":
+                item.setText(2, "Downloading...")
+                item.setForeground(2, QColor("black"))
+
+            # Update status if download is paused
+            if paused and item.text(2) != "Paused":
+                item.setText(2, "Paused")
+                item.setForeground(2, QColor("orange"))
+
+            # Check if download is finished
+            if item.text(2) == "Finished":
+                item.setForeground(2, QColor("green"))
+
+            # Update speed if available
+            if speed_str:
+                # Unchanged text means no repaint needed for this row
+                if item.text(3) != speed_str:
+                    item.setText(3, speed_str)
+            elif paused:
+                item.setText(3, "")
 
     def setup_tray(self):
         """Setup system tray icon and menu."""
@@ -583,6 +695,7 @@ class M3UDownloaderGUI(QMainWindow):
     def closeEvent(self, event):
         """Handle window close event."""
         self.status_timer.stop()
+        self._status_pool.shutdown(wait=False)
         self.download_manager.shutdown()
         self.tray_icon.hide()
         event.accept()
@@ -1,24 +1,67 @@
 import aiohttp
 import json
-from urllib.parse import urlparse, parse_qs, urlencode
+import re
+import time
+from urllib.parse import urlparse, parse_qs, quote
+
+# Panels hand out the same play_token for every stream behind one
+# account, so a token fetched once covers the whole playlist
+TOKEN_TTL = 300.0
+
+# Matches an existing play_token parameter for in-place replacement
+_PLAY_TOKEN_RE = re.compile(r'(^|&)play_token=[^&]*')
+
+def _with_token(parsed, token: str) -> str:
+    """Rebuild the stream URL with the given play_token.
+
+    Straight string assembly: the original query keeps its encoding
+    untouched instead of going through parse_qs + urlencode + geturl
+    for every URL in the playlist.
+    """
+    token_param = f"play_token={quote(token, safe='')}"
+    query = parsed.query
+    if 'play_token=' in query:
+        query = _PLAY_TOKEN_RE.sub(lambda m: m.group(1) + token_param, query, count=1)
+    elif query:
+        query = f"{query}&{token_param}"
+    else:
+        query = token_param
+    return f"{parsed.scheme}://{parsed.netloc}{parsed.path}?{query}"
 
 class IPTVAuthenticator:
     def __init__(self):
         self.session = None
-        
-    async def authenticate(self, url: str) -> str:
-        """Authenticate and get fresh token for IPTV stream"""
+        # (netloc, mac) -> (token, expiry) so bulk downloads against one
+        # panel do a single auth round-trip instead of one per URL
+        self._token_cache = {}
+
+    async def authenticate(self, url: str, force_refresh: bool = False) -> str:
+        """Authenticate and get fresh token for IPTV stream.
+
+        Pass force_refresh=True when the server rejected the current token
+        (e.g. a 458) so the cached entry is dropped instead of served back.
+        """
         parsed = urlparse(url)
         params = parse_qs(parsed.query)
-        
+
         # Extract required parameters
         mac = params.get('mac', [''])[0]
         stream_id = params.get('stream', [''])[0]
         content_type = params.get('type', [''])[0]
-        
+
         if not all([mac, stream_id, content_type]):
             return url
-            
+
+        # Reuse an unexpired cached token without touching the network
+        cache_key = (parsed.netloc, mac)
+        if force_refresh:
+            self._token_cache.pop(cache_key, None)
+        else:
+            cached = self._token_cache.get(cache_key)
+            if cached and cached[1] > time.monotonic():
+                return _with_token(parsed, cached[0])
+
+
         # Construct authentication URL
         auth_url = f"{parsed.scheme}://{parsed.netloc}/player_api.php"
         auth_params = {
@@ -31,16 +74,31 @@ class IPTVAuthenticator:
         
         try:
             if not self.session:
-                self.session = aiohttp.ClientSession()
-                
-            # First authenticate
-            async with self.session.post(f"{auth_url}?{urlencode(auth_params)}") as response:
+                # One keep-alive session for the authenticator's lifetime:
+                # the connector pools connections per host, so repeated
+                # auths against the same panel skip the TCP/TLS handshake
+                self.session = aiohttp.ClientSession(
+                    connector=aiohttp.TCPConnector(
+                        limit=32,
+                        keepalive_timeout=75,
+                        ttl_dns_cache=300
+                    )
+                )
+
+            # First authenticate; aiohttp encodes params itself
+            async with self.session.post(auth_url, params=auth_params) as response:
                 if response.status == 200:
                     data = await response.json()
                     if isinstance(data, dict) and 'token' in data:
-                        # Update URL with new token
-                        params['play_token'] = [data['token']]
-                        return parsed._replace(query=urlencode(params, doseq=True)).geturl()
+                        # Update URL with new token and remember it for
+                        # the rest of the playlist
+                        self._token_cache[cache_key] = (
+                            data['token'], time.monotonic() + TOKEN_TTL
+                        )
+                        return _with_token(parsed, data['token'])
+                elif response.status in (401, 403):
+                    # Credentials rejected - don't keep serving a stale token
+                    self._token_cache.pop(cache_key, None)
         except Exception as e:
             print(f"Authentication error: {str(e)}")
             
@@ -1,33 +1,151 @@
-from typing import List, Dict
+import mmap
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import List, Dict, Tuple
 from file_utils import sanitize_filename, get_extension_from_url
 
+# slots=True drops the per-instance __dict__, which matters when a
+# playlist holds tens of thousands of entries
+@dataclass(slots=True)
 class M3UEntry:
-    def __init__(self, title: str, url: str, filename: str):
-        self.title = title
-        self.url = url
-        self.filename = filename
+    title: str
+    url: str
+    filename: str
+    # Extension is kept so consumers don't have to re-derive it per URL
+    ext: str = ''
+
+# One C-level scan over the mapped file: the title after the first comma
+# of an #EXTINF line, any interleaved comment lines, then the URL line
+_ENTRY_RE = re.compile(rb'#EXTINF:[^,\r\n]*,([^\r\n]*)\r?\n(?:#[^\r\n]*\r?\n)*([^#\r\n][^\r\n]*)')
+
+# Lines that look like URLs (first character is neither '#' nor blank),
+# used to check the fast path didn't miss anything
+_URL_LINE_RE = re.compile(rb'^[^#\s][^\r\n]*', re.MULTILINE)
+
+# Below this size a single regex pass finishes faster than spawning
+# worker processes
+_PARALLEL_THRESHOLD = 8 * 1024 * 1024
+
+def _parse_slice(file_path: str, start: int, end: int) -> Tuple[List[Tuple[str, str]], int]:
+    """Run the regex pass over one byte range of the file.
+
+    Module-level so ProcessPoolExecutor can pickle it; returns plain
+    string tuples plus the slice's URL-line count to keep transfer cheap.
+    """
+    with open(file_path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            pairs = [
+                (t.decode('utf-8').strip(), u.decode('utf-8').strip())
+                for t, u in _ENTRY_RE.findall(mm, start, end)
+            ]
+            url_lines = len(_URL_LINE_RE.findall(mm, start, end))
+    return pairs, url_lines
 
 class M3UParser:
     @staticmethod
     def parse(file_path: str) -> List[M3UEntry]:
-        entries = []
-        current_title = None
-        
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                for line in f:
-                    line = line.strip()
-                    if line.startswith('#EXTINF:'):
-                        parts = line.split(',', 1)
-                        if len(parts) > 1:
-                            current_title = parts[1]
-                    elif line and not line.startswith('#'):
-                        title = current_title or f"Video_{len(entries) + 1}"
-                        filename = sanitize_filename(title) + get_extension_from_url(line)
-                        entries.append(M3UEntry(title, line, filename))
-                        current_title = None
-                        
+            with open(file_path, 'rb') as f:
+                try:
+                    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                except (ValueError, OSError):
+                    # Zero-length files can't be mapped
+                    return []
+
+                with mm:
+                    if len(mm) >= _PARALLEL_THRESHOLD:
+                        parsed = M3UParser._parse_parallel(file_path, mm)
+                        if parsed is not None:
+                            return parsed
+                        # Slices disagreed with the URL-line count; fall
+                        # through to the scalar pass on the whole file
+                        return M3UParser._parse_lines(mm[:].decode('utf-8'))
+
+                    matches = _ENTRY_RE.findall(mm)
+                    # Bare URLs without an #EXTINF line (or otherwise odd
+                    # layouts) escape the regex; hand those files to the
+                    # line-by-line parser rather than dropping entries
+                    if len(matches) < len(_URL_LINE_RE.findall(mm)):
+                        return M3UParser._parse_lines(mm[:].decode('utf-8'))
+
+            entries = []
+            for title_bytes, url_bytes in matches:
+                title = title_bytes.decode('utf-8').strip()
+                url = url_bytes.decode('utf-8').strip()
+                if not title:
+                    title = f"Video_{len(entries) + 1}"
+                ext = get_extension_from_url(url)
+                filename = sanitize_filename(title) + ext
+                entries.append(M3UEntry(title, url, filename, ext))
+            return entries
+
         except Exception as e:
             raise Exception(f"Failed to parse M3U file: {str(e)}")
-            
-        return entries
\ No newline at end of file
+
+    @staticmethod
+    def _parse_parallel(file_path: str, mm: mmap.mmap) -> 'List[M3UEntry] | None':
+        """Split a large playlist at entry boundaries and parse the ranges
+        in a process pool, rejoining results in order.
+
+        Returns None when the combined matches miss URL lines, signalling
+        the caller to use the scalar fallback instead.
+        """
+        size = len(mm)
+        workers = os.cpu_count() or 4
+
+        # Align each boundary to the start of the next #EXTINF line so no
+        # entry straddles two slices
+        boundaries = [0]
+        for i in range(1, workers):
+            pos = mm.find(b'\n#EXTINF', size * i // workers)
+            boundaries.append(size if pos < 0 else pos + 1)
+        boundaries.append(size)
+
+        ranges = [
+            (start, end)
+            for start, end in zip(boundaries, boundaries[1:])
+            if start < end
+        ]
+        with ProcessPoolExecutor(max_workers=len(ranges)) as pool:
+            results = list(pool.map(
+                _parse_slice,
+                (file_path for _ in ranges),
+                (r[0] for r in ranges),
+                (r[1] for r in ranges),
+            ))
+
+        pairs = [pair for slice_pairs, _ in results for pair in slice_pairs]
+        if len(pairs) < sum(url_lines for _, url_lines in results):
+            return None
+
+        entries = []
+        for title, url in pairs:
+            if not title:
+                title = f"Video_{len(entries) + 1}"
+            ext = get_extension_from_url(url)
+            filename = sanitize_filename(title) + ext
+            entries.append(M3UEntry(title, url, filename, ext))
+        return entries
+
+    @staticmethod
+    def _parse_lines(text: str) -> List[M3UEntry]:
+        """Scalar fallback for playlists the single-pass regex can't cover."""
+        entries = []
+        current_title = None
+
+        for line in text.splitlines():
+            line = line.strip()
+            if line.startswith('#EXTINF:'):
+                parts = line.split(',', 1)
+                if len(parts) > 1:
+                    current_title = parts[1]
+            elif line and not line.startswith('#'):
+                title = current_title or f"Video_{len(entries) + 1}"
+                ext = get_extension_from_url(line)
+                filename = sanitize_filename(title) + ext
+                entries.append(M3UEntry(title, line, filename, ext))
+                current_title = None
+
+        return entries
@@ -1,12 +1,19 @@
 import sys
-from PyQt6.QtWidgets import QApplication
-from gui import M3UDownloaderGUI
 
 if __name__ == "__main__":
+    # Import inside the guard so `import main` by tooling doesn't pull in
+    # PyQt6's C extensions
+    from PyQt6.QtCore import Qt
+    from PyQt6.QtWidgets import QApplication
+
+    # Must be set before the QApplication exists
+    QApplication.setAttribute(Qt.ApplicationAttribute.AA_ShareOpenGLContexts)
+
     # Create QApplication instance first
     app = QApplication(sys.argv)
 
     # Then create the main window
+    from gui import M3UDownloaderGUI
     window = M3UDownloaderGUI()
     window.show()
 
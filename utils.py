@@ -1,43 +1,73 @@
 import os
+from functools import lru_cache
 from urllib.parse import urlparse, unquote
 import re
 
+# Fast path: a known video extension ending the path needs no URL parse
+_EXT_FAST_RE = re.compile(r'\.(mp4|mkv|avi|mov|m4v|ts)(?:[?#]|$)', re.IGNORECASE)
+
+# Query strings sometimes carry the extension instead of the path
+_QUERY_EXT_RE = re.compile(r'\.(mp4|mkv|avi|mov|m4v|ts)\b')
+
+# Common video extensions
+VIDEO_EXTENSIONS = frozenset({'.mp4', '.mkv', '.avi', '.mov', '.m4v', '.ts'})
+
+@lru_cache(maxsize=4096)
 def get_extension_from_url(url: str) -> str:
     """Extract file extension from URL or default to .mp4"""
+    # Most IPTV URLs end in a plain extension; one regex search beats
+    # the unquote+urlparse+splitext chain, and the cache makes repeat
+    # lookups of the same URL free
+    match = _EXT_FAST_RE.search(url)
+    if match:
+        return '.' + match.group(1).lower()
+
     parsed = urlparse(unquote(url))
     path = parsed.path
 
-    # Common video extensions
-    VIDEO_EXTENSIONS = ['.mp4', '.mkv', '.avi', '.mov', '.m4v', '.ts']
-
     # Try to find extension in the URL path
     ext = os.path.splitext(path)[1].lower()
     if ext in VIDEO_EXTENSIONS:
         return ext
 
     # Check if extension is in query parameters
-    if '.mp4' in url.lower():
-        return '.mp4'
-    if '.mkv' in url.lower():
-        return '.mkv'
-    if '.ts' in url.lower():
-        return '.ts'
+    match = _QUERY_EXT_RE.search(url.lower())
+    if match:
+        return '.' + match.group(1)
 
     # Default to .mp4 if no extension found
     return '.mp4'
 
+# (shift, suffix) indexed by bit_length // 10 - unit selection without
+# a division-and-compare ladder
+_SPEED_UNITS = ((0, 'B/s'), (10, 'KB/s'), (20, 'MB/s'), (30, 'GB/s'))
+_last_speed = (None, '')
+_last_status = (None, '')
+
 def format_speed(speed_bytes: float) -> str:
     """Format download speed in human readable format"""
-    if speed_bytes < 1024:
-        return f"{speed_bytes:.1f} B/s"
-    elif speed_bytes < 1024*1024:
-        return f"{speed_bytes/1024:.1f} KB/s"
-    else:
-        return f"{speed_bytes/(1024*1024):.1f} MB/s"
+    global _last_speed
+    # bit_length - 1 keeps the unit switch at 1024^k, matching the old
+    # threshold ladder (plain // 10 would flip at 512 of each unit)
+    shift, suffix = _SPEED_UNITS[min((max(int(speed_bytes), 1).bit_length() - 1) // 10, 3)]
+    value = round(speed_bytes / (1 << shift), 1)
+    # Speeds are steady between ticks; reuse the last string when the
+    # displayed value hasn't changed instead of reformatting it
+    key = (value, suffix)
+    if key == _last_speed[0]:
+        return _last_speed[1]
+    text = f"{value:.1f} {suffix}"
+    _last_speed = (key, text)
+    return text
 
 def format_status(progress: float) -> str:
     """Format download status"""
+    global _last_status
     if progress >= 100:
         return "Finished"  # We'll handle the green color in the GUI
-    else:
-        return f"{progress:.1f}%"
\ No newline at end of file
+    value = round(progress, 1)
+    if value == _last_status[0]:
+        return _last_status[1]
+    text = f"{value:.1f}%"
+    _last_status = (value, text)
+    return text
\ No newline at end of file